@@ -1,63 +1,115 @@
 from collections.abc import AsyncGenerator
-from datetime import UTC, datetime
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.security import decode_access_token
-from app.crud.user import get_user_by_email
-from app.db.session import AsyncSessionLocal
+from app.crud.user import get_user_for_auth
+from app.db.session import AsyncSessionLocal, ReadSessionLocal
 from app.models.user import User
 
-# Store of invalidated tokens with their expiry time
-# In a real application, this would be in Redis or similar
-INVALIDATED_TOKENS: dict[str, datetime] = {}
+__all__ = [
+    "BearerTokenScheme",
+    "CurrentUser",
+    "CurrentUserDep",
+    "DBSession",
+    "ReadDBSession",
+    "get_current_user",
+    "get_db",
+    "get_read_db",
+    "oauth2_scheme",
+]
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for getting async database session.
 
+    The whole request runs in one transaction, committed after the endpoint
+    returns and before the response is sent, or rolled back if it raises.
+
     Yields:
         AsyncSession: The database session.
     """
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    async with AsyncSessionLocal() as session, session.begin():
+        yield session
 
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/users/login")
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for getting an async session on the read replica.
 
-# Create reusable dependencies
-DBSession = Annotated[AsyncSession, Depends(get_db)]
-CurrentUser = Annotated[str, Depends(oauth2_scheme)]
+    Yields:
+        AsyncSession: The read-only database session.
+    """
+    async with ReadSessionLocal() as session:
+        yield session
 
 
-def invalidate_user_sessions(user_id: str) -> None:
+class BearerTokenScheme(OAuth2PasswordBearer):
     """
-    Invalidate all sessions for a user.
+    OAuth2 password bearer scheme with a minimal header parser.
 
-    Args:
-        user_id: The user ID whose sessions to invalidate.
+    Subclassing keeps the OpenAPI security scheme registration while
+    replacing the generic scheme/param split with a single prefix check.
     """
-    # In a real application, this would be stored in Redis or similar
-    # with proper expiry handling
-    INVALIDATED_TOKENS[user_id] = datetime.utcnow()
+
+    async def __call__(self, request: Request) -> str | None:
+        """
+        Extract the bearer token from the ``Authorization`` header.
+
+        Args:
+            request: The incoming request.
+
+        Returns:
+            The raw token, or None when auto_error is disabled.
+
+        Raises:
+            HTTPException: If the header is missing or not a bearer token.
+        """
+        authorization = request.headers.get("authorization")
+        if authorization and authorization[:7].lower() == "bearer ":
+            return authorization[7:]
+        if not self.auto_error:
+            return None
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+# Keep the original scheme name so the published OpenAPI schema is unchanged
+oauth2_scheme = BearerTokenScheme(
+    tokenUrl=f"{settings.API_V1_STR}/users/login",
+    scheme_name="OAuth2PasswordBearer",
+)
+
+# Create reusable dependencies
+DBSession = Annotated[AsyncSession, Depends(get_db)]
+# Without a replica, reuse get_db so FastAPI shares one session per request
+ReadDBSession = Annotated[
+    AsyncSession, Depends(get_read_db if settings.DATABASE_READ_URL else get_db)
+]
+CurrentUser = Annotated[str, Depends(oauth2_scheme)]
 
 
 async def get_current_user(
+    request: Request,
     token: CurrentUser,
     db: DBSession,
 ) -> User:
     """
     Dependency for getting current authenticated user.
 
+    The resolved user is memoized on ``request.state`` so repeated resolution
+    within one request never decodes the token or queries the database twice.
+
     Args:
+        request: The incoming request.
         token: The JWT token from the request.
         db: The database session.
 
@@ -67,28 +119,23 @@ async def get_current_user(
     Raises:
         HTTPException: If the credentials are invalid or user not found.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    try:
-        payload = decode_access_token(token)
-        email: str | None = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-
-        # Get token creation time
-        iat = payload.get("iat")
-        if iat is None:
-            raise credentials_exception
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise credentials_exception from e
-
-    user = await get_user_by_email(db, email)
+    cached_user: User | None = getattr(request.state, "current_user", None)
+    if cached_user is not None:
+        return cached_user
+
+    # decode_access_token raises 401 itself for malformed, forged or expired
+    # tokens and guarantees a subject
+    payload = decode_access_token(token)
+    email: str = payload["sub"]
+    iat = payload.get("iat")
+    if iat is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = await get_user_for_auth(db, email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -101,13 +148,18 @@ async def get_current_user(
             detail="Inactive user",
         )
 
-    # Check if user's sessions have been invalidated
-    invalidation_time = INVALIDATED_TOKENS.get(str(user.id))
-    if invalidation_time and datetime.fromtimestamp(iat, UTC) < invalidation_time:
+    # Check if user's sessions have been invalidated; compare epoch seconds so
+    # the common path does not build a datetime from the iat claim
+    invalidation_time = user.token_invalidated_at
+    if invalidation_time and iat < invalidation_time.timestamp():
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been invalidated",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    request.state.current_user = user
     return user
+
+
+CurrentUserDep = Annotated[User, Depends(get_current_user)]
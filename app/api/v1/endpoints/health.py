@@ -1,11 +1,51 @@
+import asyncio
+import time
 from collections.abc import Mapping
 
 from fastapi import APIRouter, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import DBSession
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Last database probe as (monotonic timestamp, healthy). Probes arriving within
+# the window reuse it, and the lock coalesces concurrent probes into one query
+PROBE_CACHE_SECONDS = 2.0
+_last_probe: tuple[float, bool] | None = None
+_probe_lock = asyncio.Lock()
+
+
+async def _probe_database(db: AsyncSession) -> bool:
+    """
+    Check database connectivity, reusing a recent result when available.
+
+    Args:
+        db: The database session.
+
+    Returns:
+        True if the database answered the probe, False otherwise.
+    """
+    global _last_probe  # noqa: PLW0603
+
+    probe = _last_probe
+    if probe is not None and time.monotonic() - probe[0] < PROBE_CACHE_SECONDS:
+        return probe[1]
+
+    async with _probe_lock:
+        # Another request may have refreshed the probe while we waited
+        probe = _last_probe
+        if probe is not None and time.monotonic() - probe[0] < PROBE_CACHE_SECONDS:
+            return probe[1]
+        try:
+            await db.execute(text("SELECT 1"))
+            healthy = True
+        except Exception:
+            healthy = False
+        _last_probe = (time.monotonic(), healthy)
+        return healthy
 
 
 @router.get(
@@ -47,12 +87,10 @@ async def health_check(
     Returns:
         A dictionary containing the health status of the application and database.
     """
-    try:
-        await db.execute(text("SELECT 1"))
+    if await _probe_database(db):
         return {"status": "healthy", "database": "connected"}
-    except Exception:
-        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-        return {"status": "unhealthy", "database": "disconnected"}
+    response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "unhealthy", "database": "disconnected"}
 
 
 @router.get(
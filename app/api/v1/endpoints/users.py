@@ -1,40 +1,262 @@
-from datetime import UTC, datetime
+import hashlib
+import hmac
+import os
+import time
+from datetime import datetime
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from cachetools import TTLCache
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-
-from app.api.deps import INVALIDATED_TOKENS, DBSession, get_current_user
-from app.core.security import create_access_token, get_password_hash, verify_password
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import CurrentUserDep, DBSession, ReadDBSession
+from app.core.security import (
+    aget_password_hash,
+    averify_dummy_password,
+    averify_password,
+    create_access_token,
+)
 from app.crud.user import (
     create_user,
-    get_active_superuser_count,
-    get_user_by_email,
+    get_login_credentials,
     get_user_by_id,
     get_users,
+    update_user_by_id,
 )
 from app.models.user import User as UserModel
 from app.schemas.user import Token, User, UserCreate, UserPasswordUpdate, UserUpdate
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Encodes a whole result set in a single pydantic-core call
+_users_adapter = TypeAdapter(list[User])
+
+# Successful password checks keyed by (HMAC of the password, stored hash).
+# A password change produces a new hash, so stale entries can never match it.
+# The HMAC key is random per process, so cached digests are not plain password
+# hashes that could be matched against precomputed or GPU-cracked tables
+_PASSWORD_DIGEST_KEY = os.urandom(32)
+_verified_passwords: TTLCache[tuple[bytes, str], bool] = TTLCache(maxsize=2048, ttl=60)
+
+# Signed access tokens and their iat, keyed by (email, session revocation time),
+# so clients that log in repeatedly within a few seconds reuse one signature.
+# Only tokens issued at or after the revocation time are stored or reused
+_issued_tokens: TTLCache[tuple[str, datetime | None], tuple[str, float]] = TTLCache(
+    maxsize=4096, ttl=15
+)
+
+
+def expire_caches() -> dict[str, int]:
+    """
+    Drop expired entries from the password check and issued token caches.
+
+    Returns:
+        The number of entries left, keyed by cache name.
+    """
+    _verified_passwords.expire()
+    _issued_tokens.expire()
+    return {
+        "verified_passwords": len(_verified_passwords),
+        "issued_tokens": len(_issued_tokens),
+    }
+
+
+async def _verify_password_cached(password: str, hashed_password: str) -> bool:
+    """
+    Verify a password, skipping the hash for recently verified credentials.
+
+    Only successful verifications are cached.
+
+    Args:
+        password: The plain text password.
+        hashed_password: The hashed password to verify against.
+
+    Returns:
+        True if the password matches, False otherwise.
+    """
+    digest = hmac.new(_PASSWORD_DIGEST_KEY, password.encode(), hashlib.sha256)
+    key = (digest.digest(), hashed_password)
+    if key in _verified_passwords:
+        return True
+    if not await averify_password(password, hashed_password):
+        return False
+    _verified_passwords[key] = True
+    return True
+
+
+def _issue_login_token(email: str, invalidated_at: datetime | None) -> str:
+    """
+    Get an access token for a login, reusing one issued moments ago if valid.
+
+    Args:
+        email: The email of the user logging in.
+        invalidated_at: The user's session revocation cutoff, if any.
+
+    Returns:
+        An access token that the revocation check accepts.
+    """
+    cutoff = invalidated_at.timestamp() if invalidated_at else None
+    key = (email, invalidated_at)
+    cached = _issued_tokens.get(key)
+    if cached is not None and (cutoff is None or cached[1] >= cutoff):
+        return cached[0]
+
+    issued_at = time.time()
+    access_token = create_access_token(subject=email, issued_at=issued_at)
+    # A cutoff set by a host whose clock runs ahead could still postdate this
+    # token; never hand such a token out to later logins
+    if cutoff is None or issued_at >= cutoff:
+        _issued_tokens[key] = (access_token, issued_at)
+    return access_token
+
+
+def _user_from_orm(user: UserModel) -> User:
+    """
+    Build the response schema from a user row without re-validating it.
+
+    Column types and constraints already guarantee the field values, so the
+    email and type validators would only repeat work.
+
+    Args:
+        user: The user row.
+
+    Returns:
+        The user response schema.
+    """
+    return User.model_construct(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+    )
+
+
+def _user_etag(user: UserModel) -> str:
+    """
+    Build an entity tag that changes whenever the user row is modified.
+
+    Args:
+        user: The user to tag.
+
+    Returns:
+        The quoted ETag value.
+    """
+    return f'"{user.id.hex}-{user.updated_at.timestamp():.6f}"'
+
+
+def _conditional_user_response(
+    request: Request, response: Response, user: UserModel
+) -> User | Response:
+    """
+    Return the user, or 304 Not Modified if the client's copy is current.
+
+    Args:
+        request: The incoming request.
+        response: The response whose headers receive the ETag.
+        user: The user to return.
+
+    Returns:
+        An empty 304 response or the user details.
+    """
+    etag = _user_etag(user)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and any(
+        tag.strip().removeprefix("W/") in (etag, "*")
+        for tag in if_none_match.split(",")
+    ):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    response.headers["ETag"] = etag
+    return _user_from_orm(user)
+
+
+async def _apply_password_change(
+    db: AsyncSession,
+    db_user: UserModel,
+    password_update: UserPasswordUpdate,
+) -> UserModel:
+    """
+    Verify a user's current password and store the new one.
+
+    Args:
+        db: The database session.
+        db_user: The already loaded user whose password to change.
+        password_update: The password update data.
+
+    Returns:
+        The updated user.
+
+    Raises:
+        HTTPException: If the current password is incorrect.
+    """
+    # The authenticated user is loaded without its password hash
+    await db.refresh(db_user, ["hashed_password"])
+
+    # Verify current password
+    if not await averify_password(
+        password_update.current_password, db_user.hashed_password
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Incorrect password",
+        )
+
+    # Update password and invalidate all existing sessions for this user
+    hashed_password = await aget_password_hash(password_update.new_password)
+    updated_user = await update_user_by_id(
+        db,
+        db_user.id,
+        {"hashed_password": hashed_password},
+        invalidate_sessions=True,
+    )
+    if not updated_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    return updated_user
 
 
 @router.get("/", response_model=list[User])
 async def list_users_endpoint(
-    db: DBSession,
-) -> list[User]:
+    db: ReadDBSession,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    after: UUID | None = None,
+) -> Response:
     """
-    List all users endpoint handler.
+    List users endpoint handler.
 
     Args:
         db: The database session.
+        limit: Maximum number of users to return.
+        offset: Number of users to skip.
+        after: Keyset cursor; the ID of the last user on the previous page.
 
     Returns:
-        List of users.
+        List of users in the requested page.
     """
-    users = await get_users(db)
-    return [User.model_validate(user) for user in users]
+    users = await get_users(db, limit=limit, offset=offset, after=after)
+    # Rows are trusted, so skip validation (notably the Python email validator)
+    # and encode in pydantic-core, bypassing FastAPI's re-serialization
+    return Response(
+        content=_users_adapter.dump_json([_user_from_orm(user) for user in users]),
+        media_type="application/json",
+    )
 
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
@@ -55,31 +277,52 @@ async def create_user_endpoint(
     Raises:
         HTTPException: If the email is already registered.
     """
-    user = await get_user_by_email(db, user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
     db_user = await create_user(db, user_in)
-    await db.commit()  # Commit the transaction
-    return User.model_validate(db_user)
+    return _user_from_orm(db_user)
 
 
 @router.get("/me", response_model=User)
 async def read_user_me_endpoint(
-    current_user: Annotated[UserModel, Depends(get_current_user)],
-) -> User:
+    request: Request,
+    response: Response,
+    current_user: CurrentUserDep,
+) -> User | Response:
     """
     Get current user endpoint handler.
 
     Args:
+        request: The incoming request.
+        response: The outgoing response.
         current_user: The current user.
 
     Returns:
-        The current user's details.
+        The current user's details, or 304 if unchanged since the given ETag.
     """
-    return User.model_validate(current_user)
+    return _conditional_user_response(request, response, current_user)
+
+
+@router.post("/me/change-password", response_model=User)
+async def change_password_me_endpoint(
+    password_update: UserPasswordUpdate,
+    current_user: CurrentUserDep,
+    db: DBSession,
+) -> User:
+    """
+    Change current user's password endpoint handler.
+
+    Args:
+        password_update: The password update data.
+        current_user: The current authenticated user.
+        db: The database session.
+
+    Returns:
+        The updated user details.
+
+    Raises:
+        HTTPException: If the current password is incorrect.
+    """
+    db_user = await _apply_password_change(db, current_user, password_update)
+    return _user_from_orm(db_user)
 
 
 @router.post("/login", response_model=Token)
@@ -100,14 +343,16 @@ async def login(
     Raises:
         HTTPException: If authentication fails.
     """
-    user = await get_user_by_email(db, form_data.username)
+    user = await get_login_credentials(db, form_data.username)
     if not user:
+        # Hash anyway so unknown emails take as long as wrong passwords
+        await averify_dummy_password(form_data.password)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
 
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await _verify_password_cached(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -119,17 +364,17 @@ async def login(
             detail="User is inactive",
         )
 
-    return Token(
-        access_token=create_access_token(subject=user.email),
-        token_type="bearer",
-    )
+    access_token = _issue_login_token(user.email, user.token_invalidated_at)
+
+    # Both fields are known-good strings, so skip validation
+    return Token.model_construct(access_token=access_token, token_type="bearer")
 
 
 @router.patch("/{user_id}", response_model=User)
 async def update_user_endpoint(
     user_id: UUID,
     user_update: UserUpdate,
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+    current_user: CurrentUserDep,
     db: DBSession,
 ) -> User:
     """
@@ -147,54 +392,44 @@ async def update_user_endpoint(
     Raises:
         HTTPException: If the user is not found or if the current user lacks permission.
     """
-    try:
-        # Check if user exists
-        db_user = await get_user_by_id(db, user_id)
-        if not db_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
+    # Check permissions (only superuser or the user themselves can update)
+    if not current_user.is_superuser and current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
 
-        # Check permissions (only superuser or the user themselves can update)
-        if not current_user.is_superuser and current_user.id != db_user.id:
+    # Update user
+    update_data = user_update.model_dump(exclude_unset=True)
+    if "password" in update_data:
+        update_data["hashed_password"] = await aget_password_hash(
+            update_data.pop("password")
+        )
+    # Demoting or deactivating must not remove the last active superuser
+    revokes_superuser = user_update.is_superuser is False or (
+        user_update.is_active is False
+    )
+    db_user = await update_user_by_id(
+        db, user_id, update_data, keep_last_superuser=revokes_superuser
+    )
+    if not db_user:
+        if revokes_superuser and await get_user_by_id(db, user_id):
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot remove superuser status from the last superuser",
             )
-
-        # Prevent removing superuser status from the last superuser
-        if db_user.is_superuser and user_update.is_superuser is False:
-            # Count active superusers
-            active_superusers = await get_active_superuser_count(db)
-            if active_superusers <= 1:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Cannot remove superuser status from the last superuser",
-                )
-
-        # Update user
-        update_data = user_update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_user, field, value)
-        await db.flush()
-        await db.refresh(db_user)
-        await db.commit()  # Commit the changes
-
-        return User.model_validate(db_user)
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to update user",
-        ) from e
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    return _user_from_orm(db_user)
 
 
 @router.post("/{user_id}/deactivate", response_model=User)
 async def deactivate_user_endpoint(
     user_id: UUID,
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+    current_user: CurrentUserDep,
     db: DBSession,
 ) -> User:
     """
@@ -211,56 +446,41 @@ async def deactivate_user_endpoint(
     Raises:
         HTTPException: If the user is not found or if the current user lacks permission.
     """
-    try:
-        # Check if user exists
-        db_user = await get_user_by_id(db, user_id)
-        if not db_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
+    # Check permissions (only superuser can deactivate users)
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
 
-        # Check permissions (only superuser can deactivate users)
-        if not current_user.is_superuser:
+    # Deactivate user and invalidate their sessions, unless they are the last
+    # active superuser
+    db_user = await update_user_by_id(
+        db,
+        user_id,
+        {"is_active": False},
+        invalidate_sessions=True,
+        keep_last_superuser=True,
+    )
+    if not db_user:
+        if await get_user_by_id(db, user_id):
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot deactivate the last superuser",
             )
-
-        # Prevent deactivating the last superuser
-        if db_user.is_superuser:
-            # Count active superusers
-            active_superusers = await get_active_superuser_count(db)
-            if active_superusers <= 1:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Cannot deactivate the last superuser",
-                )
-
-        # Deactivate user
-        db_user.is_active = False
-        await db.flush()
-        await db.refresh(db_user)
-        await db.commit()  # Commit the changes
-
-        # Invalidate user's sessions
-        INVALIDATED_TOKENS[str(user_id)] = datetime.now(UTC)
-
-        return User.model_validate(db_user)
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to deactivate user",
-        ) from e
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    return _user_from_orm(db_user)
 
 
 @router.post("/{user_id}/change-password", response_model=User)
 async def change_password_endpoint(
     user_id: UUID,
     password_update: UserPasswordUpdate,
-    current_user: Annotated[UserModel, Depends(get_current_user)],
+    current_user: CurrentUserDep,
     db: DBSession,
 ) -> User:
     """
@@ -278,118 +498,57 @@ async def change_password_endpoint(
     Raises:
         HTTPException: If the user is not found or if the current user lacks permission.
     """
-    try:
-        # Check if user exists
-        db_user = await get_user_by_id(db, user_id)
-        if not db_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
-
-        # Check permissions (only the user themselves can change their password)
-        if current_user.id != db_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions",
-            )
-
-        # Verify current password
-        if not verify_password(
-            password_update.current_password, db_user.hashed_password
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Incorrect password",
-            )
-
-        # Update password
-        db_user.hashed_password = get_password_hash(password_update.new_password)
-        await db.flush()
-        await db.refresh(db_user)
-
-        # Invalidate all existing sessions for this user
-        INVALIDATED_TOKENS[str(user_id)] = datetime.now(UTC)
-
-        return User.model_validate(db_user)
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
+    # Check permissions (only the user themselves can change their password)
+    if current_user.id != user_id:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to change password",
-        ) from e
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+
+    db_user = await _apply_password_change(db, current_user, password_update)
+    return _user_from_orm(db_user)
 
 
 @router.get("/{user_id}", response_model=User)
 async def get_user_endpoint(
+    request: Request,
+    response: Response,
     user_id: UUID,
-    current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: DBSession,
-) -> User:
+    current_user: CurrentUserDep,
+    db: ReadDBSession,
+) -> User | Response:
     """
     Get user by ID endpoint handler.
 
     Args:
+        request: The incoming request.
+        response: The outgoing response.
         user_id: The ID of the user to retrieve.
         current_user: The current authenticated user.
         db: The database session.
 
     Returns:
-        The user details.
+        The user details, or 304 if unchanged since the given ETag.
 
     Raises:
         HTTPException: If the user is not found or if the current user lacks permission.
     """
-    try:
-        # Check if user exists and get fresh data
-        db_user = await get_user_by_id(db, user_id)
-        if not db_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
-
-        # Check permissions (only superuser or the user themselves can view details)
-        if not current_user.is_superuser and current_user.id != db_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions",
-            )
-
-        return User.model_validate(db_user)
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
+    # Check permissions first (only superuser or the user themselves can view
+    # details) so that non-superusers cannot probe which user IDs exist
+    if current_user.id == user_id:
+        # The authenticated user was loaded for this request already
+        return _conditional_user_response(request, response, current_user)
+    if not current_user.is_superuser:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to retrieve user",
-        ) from e
-
-
-@router.post("/me/change-password", response_model=User)
-async def change_password_me_endpoint(
-    password_update: UserPasswordUpdate,
-    current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: DBSession,
-) -> User:
-    """
-    Change current user's password endpoint handler.
-
-    Args:
-        password_update: The password update data.
-        current_user: The current authenticated user.
-        db: The database session.
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
 
-    Returns:
-        The updated user details.
+    db_user = await get_user_by_id(db, user_id)
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
 
-    Raises:
-        HTTPException: If the current password is incorrect.
-    """
-    return await change_password_endpoint(
-        user_id=current_user.id,
-        password_update=password_update,
-        current_user=current_user,
-        db=db,
-    )
+    return _conditional_user_response(request, response, db_user)
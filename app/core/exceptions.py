@@ -2,6 +2,7 @@ from typing import Any, TypeVar
 
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import SQLAlchemyError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 T = TypeVar("T")
@@ -50,6 +51,17 @@ def configure_exceptions(app: FastAPI) -> None:
             headers=getattr(exc, "headers", None),
         )
 
+    @app.exception_handler(SQLAlchemyError)
+    async def database_exception_handler(
+        request: Request,
+        exc: SQLAlchemyError,
+    ) -> JSONResponse:
+        """Handle database errors raised while serving a request."""
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"detail": "Database error"},
+        )
+
     @app.exception_handler(Exception)
     async def unhandled_exception_handler(
         request: Request,
@@ -1,26 +1,92 @@
-from datetime import UTC, datetime, timedelta
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from typing import Any
 
+import jwt
+import orjson
+from cachetools import TTLCache
 from fastapi import HTTPException, status
-from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
 __all__ = [
+    "aget_password_hash",
+    "averify_dummy_password",
+    "averify_password",
     "create_access_token",
     "decode_access_token",
+    "expire_caches",
+    "get_dummy_password_hash",
     "get_password_hash",
     "verify_password",
 ]
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes use Argon2id (OWASP's minimum is 19 MiB, t=2, p=1); bcrypt stays
+# verifiable so existing password hashes keep working. Stored hashes carry their
+# own parameters, so changing the settings only affects newly hashed passwords
+_pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__memory_cost=settings.PASSWORD_HASH_MEMORY_COST,
+    argon2__time_cost=settings.PASSWORD_HASH_TIME_COST,
+    argon2__parallelism=1,
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+)
+
+# Hashed at import so that even the first unknown-email login in a process
+# costs one hash, the same as a login with a wrong password
+_DUMMY_PASSWORD_HASH = _pwd_context.hash("x" * 16)
+
+# Decoded JWT payloads keyed by the SHA-256 digest of the raw token, so repeat
+# requests with the same token skip signature verification
+DECODE_CACHE_TTL_SECONDS = 30
+_decode_cache: TTLCache[bytes, tuple[dict[str, Any], float]] = TTLCache(
+    maxsize=10_000, ttl=DECODE_CACHE_TTL_SECONDS
+)
+
+# Token settings are fixed for the life of the process, so read them once
+_ACCESS_TOKEN_LIFETIME_SECONDS = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+_JWT_KEY = settings.SECRET_KEY
+_JWT_ALGORITHM = settings.ALGORITHM
+
+# HMAC algorithms signed and verified without going through PyJWT. The keyed
+# HMAC state is built once and copied per token, skipping the key setup
+_HS_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+_hmac_template = (
+    hmac.new(_JWT_KEY.encode(), digestmod=_HS_DIGESTS[_JWT_ALGORITHM])
+    if _JWT_ALGORITHM in _HS_DIGESTS
+    else None
+)
+
+# Password hashing is CPU bound and releases the GIL, so it runs on its own
+# pool sized to the machine instead of competing with other threadpool work
+_password_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1,
+    thread_name_prefix="password-hash",
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain password against a hashed password.
 
+    passlib compares the recomputed digest in constant time, so this is safe
+    to use directly; other secrets should be compared with
+    ``hmac.compare_digest`` rather than ``==``.
+
     Args:
         plain_password: The plain text password.
         hashed_password: The hashed password to verify against.
@@ -28,7 +94,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         True if the password matches, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -41,12 +107,72 @@ def get_password_hash(password: str) -> str:
     Returns:
         The hashed password.
     """
-    return pwd_context.hash(password)
+    return _pwd_context.hash(password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password on the password hashing pool.
+
+    Args:
+        plain_password: The plain text password.
+        hashed_password: The hashed password to verify against.
+
+    Returns:
+        True if the password matches, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def aget_password_hash(password: str) -> str:
+    """
+    Hash a password on the password hashing pool.
+
+    Args:
+        password: The password to hash.
+
+    Returns:
+        The hashed password.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
+async def averify_dummy_password(password: str) -> None:
+    """
+    Spend the cost of a password check without a real account to check against.
+
+    Args:
+        password: The submitted plain text password.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        _password_executor,
+        lambda: verify_password(password, get_dummy_password_hash()),
+    )
+
+
+def get_dummy_password_hash() -> str:
+    """
+    Get a hash of a throwaway password, computed once at import.
+
+    Verifying against it lets callers spend the same hashing cost whether or
+    not an account exists, so response times do not reveal registered emails.
+
+    Returns:
+        A hash produced with the same parameters as real password hashes.
+    """
+    return _DUMMY_PASSWORD_HASH
 
 
 def create_access_token(
     subject: str | Any,
     expires_delta: timedelta | None = None,
+    *,
+    issued_at: float | None = None,
 ) -> str:
     """
     Create a JWT access token.
@@ -54,32 +180,82 @@ def create_access_token(
     Args:
         subject: The subject to create the token for.
         expires_delta: Optional expiration time delta.
+        issued_at: The ``iat`` timestamp to issue with; defaults to now.
 
     Returns:
         The encoded JWT token.
     """
-    now = datetime.now(UTC)
+    # iat keeps sub-second precision so that it orders correctly against
+    # session revocation cutoffs taken within the same second
+    now = time.time() if issued_at is None else issued_at
     if expires_delta:
-        expire = now + expires_delta
+        expire = int(now + expires_delta.total_seconds())
     else:
-        expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(now) + _ACCESS_TOKEN_LIFETIME_SECONDS
 
     to_encode = {
         "exp": expire,
         "sub": str(subject),
-        "iat": int(now.timestamp()),
+        "iat": now,
     }
+    if _hmac_template is not None:
+        return _encode_hs_token(to_encode, _hmac_template)
     encoded_jwt = jwt.encode(
         to_encode,
-        settings.SECRET_KEY,
-        algorithm=settings.ALGORITHM,
+        _JWT_KEY,
+        algorithm=_JWT_ALGORITHM,
     )
     return encoded_jwt
 
 
 def decode_access_token(token: str) -> dict[str, Any]:
     """
-    Decode a JWT token and return its payload.
+    Decode a JWT token, reusing a recently verified payload when possible.
+
+    Cached entries never outlive the token's own ``exp`` claim.
+
+    Args:
+        token: The JWT token to decode.
+
+    Returns:
+        A fresh copy of the decoded token payload, safe for the caller to modify.
+
+    Raises:
+        HTTPException: If the token is invalid or expired.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    cached = _decode_cache.get(key)
+    if cached is not None:
+        payload, expires_at = cached
+        if now < expires_at:
+            return dict(payload)
+        _decode_cache.pop(key, None)
+
+    payload = _verify_access_token(token)
+    exp = payload.get("exp")
+    if isinstance(exp, int | float):
+        _decode_cache[key] = (
+            dict(payload),
+            min(now + DECODE_CACHE_TTL_SECONDS, exp),
+        )
+    return payload
+
+
+def expire_caches() -> dict[str, int]:
+    """
+    Drop expired entries from the decoded token cache.
+
+    Returns:
+        The number of entries left, keyed by cache name.
+    """
+    _decode_cache.expire()
+    return {"decoded_tokens": len(_decode_cache)}
+
+
+def _verify_access_token(token: str) -> dict[str, Any]:
+    """
+    Verify a JWT token's signature and claims and return its payload.
 
     Args:
         token: The JWT token to decode.
@@ -91,11 +267,13 @@ def decode_access_token(token: str) -> dict[str, Any]:
         HTTPException: If the token is invalid or expired.
     """
     try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
-        )
+        payload = _decode_hs_token(token)
+        if payload is None:
+            payload = jwt.decode(
+                token,
+                _JWT_KEY,
+                algorithms=[_JWT_ALGORITHM],
+            )
         if not payload or "sub" not in payload:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -103,9 +281,95 @@ def decode_access_token(token: str) -> dict[str, Any]:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         return payload
-    except JWTError as e:
+    except jwt.InvalidTokenError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Could not validate credentials: {str(e)!s}",
             headers={"WWW-Authenticate": "Bearer"},
         ) from e
+
+
+def _b64url_encode(data: bytes) -> str:
+    """Encode bytes as unpadded base64url, as used in JWT segments."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(segment: str) -> bytes:
+    """Decode an unpadded base64url JWT segment."""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+_HS_HEADER_SEGMENT = _b64url_encode(orjson.dumps({"alg": _JWT_ALGORITHM, "typ": "JWT"}))
+
+
+def _encode_hs_token(claims: dict[str, Any], template: hmac.HMAC) -> str:
+    """
+    Sign claims with the configured HMAC algorithm.
+
+    Produces the same compact serialization as PyJWT.
+
+    Args:
+        claims: The JSON-serializable token claims.
+        template: The keyed HMAC state to copy for signing.
+
+    Returns:
+        The encoded JWT token.
+    """
+    payload_segment = _b64url_encode(orjson.dumps(claims))
+    signing_input = f"{_HS_HEADER_SEGMENT}.{payload_segment}"
+    mac = template.copy()
+    mac.update(signing_input.encode())
+    return f"{signing_input}.{_b64url_encode(mac.digest())}"
+
+
+def _decode_hs_token(token: str) -> dict[str, Any] | None:
+    """
+    Verify a token signed with the configured HMAC algorithm.
+
+    Only tokens with exactly the header and claims this module issues are
+    handled here; anything else returns None so PyJWT can apply its full
+    validation.
+
+    Args:
+        token: The JWT token to decode.
+
+    Returns:
+        The decoded token payload, or None if PyJWT should handle the token.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is malformed, forged or expired.
+    """
+    if _hmac_template is None:
+        return None
+    signing_input, _, signature_segment = token.rpartition(".")
+    header_segment, _, payload_segment = signing_input.partition(".")
+    if header_segment != _HS_HEADER_SEGMENT or "." in payload_segment:
+        return None
+
+    try:
+        signature = _b64url_decode(signature_segment)
+        payload = orjson.loads(_b64url_decode(payload_segment))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise jwt.DecodeError("Invalid token encoding") from e
+
+    mac = _hmac_template.copy()
+    mac.update(signing_input.encode())
+    if not hmac.compare_digest(mac.digest(), signature):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+
+    if not isinstance(payload, dict) or payload.keys() - {"exp", "iat", "sub"}:
+        return None
+    now = time.time()
+    exp = payload.get("exp")
+    if exp is not None:
+        if not isinstance(exp, int | float):
+            raise jwt.DecodeError("Expiration Time claim (exp) must be a number")
+        if exp <= now:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+    iat = payload.get("iat")
+    if iat is not None:
+        if not isinstance(iat, int | float):
+            raise jwt.InvalidIssuedAtError("Issued At claim (iat) must be a number")
+        if iat > now:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+    return payload
@@ -1,35 +1,200 @@
+import asyncio
+from datetime import UTC, datetime
+from typing import Any, NamedTuple
 from uuid import UUID
 
+from cachetools import TTLCache
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import Select, event, func, lambda_stmt, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.core.security import get_password_hash
+from sqlalchemy.orm import (
+    Session,
+    SessionTransaction,
+    defer,
+    make_transient_to_detached,
+)
+
+from app.core.security import aget_password_hash
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
 __all__ = [
     "get_users",
     "get_user_by_email",
+    "get_user_for_auth",
+    "LoginCredentials",
+    "get_login_credentials",
     "create_user",
+    "create_users",
     "update_user",
+    "update_user_by_id",
     "get_user_by_id",
     "get_active_superuser_count",
+    "expire_caches",
 ]
 
 
-async def get_users(db: AsyncSession) -> list[User]:
+class LoginCredentials(NamedTuple):
+    """The columns needed to authenticate a login attempt."""
+
+    id: UUID
+    email: str
+    hashed_password: str
+    is_active: bool
+    token_invalidated_at: datetime | None
+
+
+# Login lookups keyed by email, including misses (None) so repeated attempts
+# against unknown emails skip the database too. Writes through this module
+# evict affected entries; other workers converge within the TTL
+LOGIN_CACHE_TTL_SECONDS = 30
+_login_cache: TTLCache[str, LoginCredentials | None] = TTLCache(
+    maxsize=10_000, ttl=LOGIN_CACHE_TTL_SECONDS
+)
+
+
+# Mapped column names, for filtering update payloads without hasattr() probes
+_USER_COLUMNS = frozenset(attr.key for attr in User.__mapper__.column_attrs)
+
+# Columns that revoke access or privileges. They are read from the database on
+# every authenticated request, so deactivation, demotion and session revocation
+# committed by any worker apply at once rather than after the cache TTL
+_AUTH_FRESH_COLUMNS = ("is_active", "is_superuser", "token_invalidated_at")
+
+# Remaining column values of users resolved from access tokens, keyed by email.
+# Only hits are cached; each request gets its own instance built from the values
+_AUTH_COLUMNS = tuple(
+    attr.key
+    for attr in User.__mapper__.column_attrs
+    if attr.key != "hashed_password" and attr.key not in _AUTH_FRESH_COLUMNS
+)
+_auth_cache: TTLCache[str, dict[str, Any]] = TTLCache(
+    maxsize=10_000, ttl=LOGIN_CACHE_TTL_SECONDS
+)
+
+# Emails each user is cached under in either cache, so evictions do not scan
+# the caches. Every store resets the entry's TTL, so it outlives what it indexes
+_cached_emails: TTLCache[UUID, frozenset[str]] = TTLCache(
+    maxsize=20_000, ttl=LOGIN_CACHE_TTL_SECONDS
+)
+
+# Session.info key collecting the users a session has written, whose cache
+# entries are evicted once its transaction commits
+_PENDING_EVICTIONS = "pending_user_evictions"
+
+# Bumped by every eviction; a lookup that overlapped one does not cache what
+# it read, since the row may have changed after it was queried
+_cache_generation = 0
+
+
+def _forget_login(db: AsyncSession, user_id: UUID, email: str | None = None) -> None:
+    """
+    Evict a user's cached credentials and identity when the session commits.
+
+    Evicting before the commit would let concurrent requests cache the old row
+    again until the TTL expires.
+
+    Args:
+        db: The session whose transaction wrote the user.
+        user_id: The ID of the user whose credentials changed.
+        email: The user's current email, which may be cached as a miss.
+    """
+    db.info.setdefault(_PENDING_EVICTIONS, set()).add((user_id, email))
+
+
+def _has_pending_writes(db: AsyncSession) -> bool:
+    """Whether the session has uncommitted user writes the caches do not see."""
+    return bool(db.info.get(_PENDING_EVICTIONS))
+
+
+def _remember_email(user_id: UUID, email: str) -> None:
+    """Index a cache entry stored under ``email`` for the given user."""
+    _cached_emails[user_id] = _cached_emails.get(user_id, frozenset()) | {email}
+
+
+def _evict(user_id: UUID, email: str | None) -> None:
+    """Drop every cache entry stored for a user."""
+    global _cache_generation  # noqa: PLW0603
+
+    _cache_generation += 1
+    emails = _cached_emails.pop(user_id, frozenset())
+    if email is not None:
+        emails |= {email}
+    for cached_email in emails:
+        _login_cache.pop(cached_email, None)
+        _auth_cache.pop(cached_email, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed_users(session: Session) -> None:
+    """Evict cache entries for users written by a committed transaction."""
+    # Releasing a savepoint also fires after_commit, but nothing is durable yet
+    if session.in_nested_transaction():
+        return
+    for user_id, email in session.info.pop(_PENDING_EVICTIONS, ()):
+        _evict(user_id, email)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_evictions(
+    session: Session, transaction: SessionTransaction
+) -> None:
+    """Drop evictions left scheduled when the outermost transaction ends."""
+    # Committed evictions were already run; rolled back writes left the
+    # cached rows current
+    if transaction.parent is None:
+        session.info.pop(_PENDING_EVICTIONS, None)
+
+
+def expire_caches() -> dict[str, int]:
     """
-    Get all users.
+    Drop expired entries from the login and authentication caches.
+
+    Returns:
+        The number of entries left, keyed by cache name.
+    """
+    _login_cache.expire()
+    _auth_cache.expire()
+    _cached_emails.expire()
+    return {"login_credentials": len(_login_cache), "auth_users": len(_auth_cache)}
+
+
+async def get_users(
+    db: AsyncSession,
+    *,
+    limit: int = 100,
+    offset: int = 0,
+    after: UUID | None = None,
+) -> list[User]:
+    """
+    Get a page of users.
+
+    Users are ordered by ID so that consecutive pages do not overlap. Passing
+    the last ID of the previous page as ``after`` seeks directly to the next
+    page instead of scanning past ``offset`` rows. Password hashes are not
+    loaded, as with ``get_user_for_auth``.
 
     Args:
         db: The database session.
+        limit: Maximum number of users to return.
+        offset: Number of users to skip.
+        after: Only return users whose ID sorts after this one.
 
     Returns:
-        List of all users.
+        List of users in the requested page.
     """
-    result = await db.execute(select(User))
+    stmt = (
+        select(User)
+        .options(defer(User.hashed_password, raiseload=True))
+        .order_by(User.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    if after is not None:
+        stmt = stmt.where(User.id > after)
+    result = await db.execute(stmt)
     return list(result.scalars().all())
 
 
@@ -44,10 +209,117 @@ async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     Returns:
         The user if found, None otherwise.
     """
-    result = await db.execute(select(User).where(User.email == email))
+    # Lambda statements are built and cache-keyed once; later calls only bind
+    # the new parameter value
+    result = await db.execute(
+        lambda_stmt(lambda: select(User).where(User.email == email))
+    )
     return result.scalar_one_or_none()
 
 
+async def get_user_for_auth(db: AsyncSession, email: str) -> User | None:
+    """
+    Get a user by email for request authentication.
+
+    The password hash is not loaded; callers that need it must refresh the
+    ``hashed_password`` attribute explicitly. Found users are cached, so most
+    authenticated requests only query the user's access and privilege columns.
+
+    Args:
+        db: The database session.
+        email: The email to look up.
+
+    Returns:
+        The user if found, None otherwise.
+    """
+    # A session that has written users must see its own uncommitted changes
+    pending_writes = _has_pending_writes(db)
+    values = None if pending_writes else _auth_cache.get(email)
+    if values is not None:
+        user_id = values["id"]
+        result = await db.execute(
+            lambda_stmt(
+                lambda: select(
+                    User.is_active, User.is_superuser, User.token_invalidated_at
+                ).where(User.id == user_id, User.email == email)
+            )
+        )
+        fresh = result.one_or_none()
+        if fresh is not None:
+            user = User(**values, **fresh._asdict())
+            make_transient_to_detached(user)
+            return await db.merge(user, load=False)
+        # Deleted or renamed by another worker; look the email up again
+        _auth_cache.pop(email, None)
+
+    generation = _cache_generation
+    result = await db.execute(
+        lambda_stmt(
+            lambda: (
+                select(User)
+                .options(defer(User.hashed_password, raiseload=True))
+                .where(User.email == email)
+            )
+        )
+    )
+    found = result.scalar_one_or_none()
+    if found is not None and not pending_writes and generation == _cache_generation:
+        _auth_cache[email] = {key: getattr(found, key) for key in _AUTH_COLUMNS}
+        _remember_email(found.id, email)
+    return found
+
+
+async def get_login_credentials(
+    db: AsyncSession, email: str
+) -> LoginCredentials | None:
+    """
+    Get the credentials for a login attempt, served from cache when possible.
+
+    Args:
+        db: The database session.
+        email: The email to look up.
+
+    Returns:
+        The user's login credentials if found, None otherwise.
+    """
+    # A session that has written users must see its own uncommitted changes
+    pending_writes = _has_pending_writes(db)
+    if not pending_writes:
+        try:
+            return _login_cache[email]
+        except KeyError:
+            pass
+
+    generation = _cache_generation
+    result = await db.execute(
+        select(
+            User.id,
+            User.email,
+            User.hashed_password,
+            User.is_active,
+            User.token_invalidated_at,
+        ).where(User.email == email)
+    )
+    row = result.one_or_none()
+    credentials = LoginCredentials(*row) if row is not None else None
+    if not pending_writes and generation == _cache_generation:
+        _login_cache[email] = credentials
+        if credentials is not None:
+            _remember_email(credentials.id, email)
+    return credentials
+
+
+def _user_row(user_in: UserCreate, hashed_password: str) -> dict[str, Any]:
+    """Build the insert values for a new user without dumping the schema."""
+    return {
+        "email": user_in.email,
+        "full_name": user_in.full_name,
+        "is_active": user_in.is_active,
+        "is_superuser": user_in.is_superuser,
+        "hashed_password": hashed_password,
+    }
+
+
 async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     """
     Create new user.
@@ -62,30 +334,66 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     Raises:
         HTTPException: If the email is already registered.
     """
-    user_data = user_in.model_dump(exclude={"password"})
-    db_user = User(
-        **user_data,
-        hashed_password=get_password_hash(user_in.password),
+    # ON CONFLICT keeps duplicate emails from aborting the transaction and
+    # replaces a separate existence check with a single round-trip
+    hashed_password = await aget_password_hash(user_in.password)
+    stmt = (
+        insert(User)
+        .values(_user_row(user_in, hashed_password))
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
     )
+    db_user = await db.scalar(stmt)
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
+    _forget_login(db, db_user.id, db_user.email)
+    return db_user
 
-    try:
-        async with db.begin_nested():  # Create a savepoint
-            db.add(db_user)
-            await db.flush()  # Just flush to get the ID
-            await db.refresh(db_user)
-            return db_user
-    except IntegrityError as e:
-        if "ix_users_email" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered",
-            ) from e
-        raise  # Re-raise other integrity errors
-    except Exception as e:
+
+async def create_users(db: AsyncSession, users_in: list[UserCreate]) -> list[UUID]:
+    """
+    Create many users with a single ``INSERT``, for seeding and imports.
+
+    Passwords are hashed concurrently on the password hashing pool.
+
+    Args:
+        db: The database session.
+        users_in: The user data to create.
+
+    Returns:
+        The IDs of the created users.
+
+    Raises:
+        HTTPException: If any email is already registered or repeated.
+    """
+    if not users_in:
+        return []
+    hashed_passwords = await asyncio.gather(
+        *(aget_password_hash(user_in.password) for user_in in users_in)
+    )
+    rows = [
+        _user_row(user_in, hashed)
+        for user_in, hashed in zip(users_in, hashed_passwords, strict=True)
+    ]
+    stmt = (
+        insert(User)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.id)
+    )
+    user_ids = list((await db.scalars(stmt)).all())
+    if len(user_ids) != len(rows):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create user",
-        ) from e
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
+    # New users can only be cached as login misses, keyed by email
+    for user_id, row in zip(user_ids, rows, strict=True):
+        _forget_login(db, user_id, row["email"])
+    return user_ids
 
 
 async def update_user(db: AsyncSession, db_user: User, user_in: UserUpdate) -> User:
@@ -101,42 +409,96 @@ async def update_user(db: AsyncSession, db_user: User, user_in: UserUpdate) -> U
         The updated user.
 
     Raises:
-        HTTPException: If the update fails or validation fails.
+        HTTPException: If the new email is already registered.
     """
+    update_data = user_in.model_dump(exclude_unset=True)
+
+    # Handle password update
+    if "password" in update_data:
+        update_data["hashed_password"] = await aget_password_hash(
+            update_data.pop("password")
+        )
+
+    # Update user fields
+    for field, value in update_data.items():
+        if field in _USER_COLUMNS:
+            setattr(db_user, field, value)
+
+    # The unique email index rejects duplicates, so no lookup is needed first
     try:
-        update_data = user_in.model_dump(exclude_unset=True)
+        await db.flush()
+    except IntegrityError as e:
+        if "ix_users_email" in str(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered",
+            ) from e
+        raise
 
-        # Handle password update
-        if "password" in update_data:
-            update_data["hashed_password"] = get_password_hash(
-                update_data.pop("password")
-            )
+    _forget_login(db, db_user.id, db_user.email)
+    return db_user
 
-        # Validate email uniqueness if it's being updated
-        if "email" in update_data and update_data["email"] != db_user.email:
-            existing_user = await get_user_by_email(db, update_data["email"])
-            if existing_user:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered",
-                )
-
-        # Update user fields
-        for field, value in update_data.items():
-            if hasattr(db_user, field):
-                setattr(db_user, field, value)
-
-        return db_user
-    except Exception as e:
-        import logging
-
-        logging.error("Error in update_user: %s", str(e), exc_info=True)
-        if isinstance(e, HTTPException):
-            raise
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to update user: " + str(e),
-        ) from e
+
+async def update_user_by_id(
+    db: AsyncSession,
+    user_id: UUID,
+    values: dict[str, Any],
+    *,
+    invalidate_sessions: bool = False,
+    keep_last_superuser: bool = False,
+) -> User | None:
+    """
+    Update a user by ID with a single ``UPDATE ... RETURNING`` statement.
+
+    Args:
+        db: The database session.
+        user_id: The ID of the user to update.
+        values: The column values to set.
+        invalidate_sessions: Whether to revoke all tokens issued so far.
+        keep_last_superuser: Skip the update if the user is the only active
+            superuser, for updates that would revoke that status.
+
+    Returns:
+        The updated user if found (and not the protected last superuser),
+        None otherwise.
+
+    Raises:
+        HTTPException: If the email is already registered.
+    """
+    if invalidate_sessions:
+        # Token iat claims come from the app clock with sub-second precision,
+        # so the cutoff must too; the database's now() is skewed and frozen at
+        # transaction start
+        values = {**values, "token_invalidated_at": datetime.now(UTC)}
+    if not values:
+        return await get_user_by_id(db, user_id)
+
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(**values)
+        .returning(User)
+        .execution_options(populate_existing=True)
+    )
+    if keep_last_superuser:
+        stmt = stmt.where(
+            or_(
+                ~(User.is_superuser & User.is_active),
+                _active_superuser_count_query().scalar_subquery() > 1,
+            )
+        )
+    try:
+        result = await db.execute(stmt)
+    except IntegrityError as e:
+        if "ix_users_email" in str(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered",
+            ) from e
+        raise
+    db_user = result.scalar_one_or_none()
+    _forget_login(db, user_id, db_user.email if db_user else None)
+    return db_user
 
 
 async def get_user_by_id(db: AsyncSession, user_id: UUID) -> User | None:
@@ -150,7 +512,9 @@ async def get_user_by_id(db: AsyncSession, user_id: UUID) -> User | None:
     Returns:
         The user if found, None otherwise.
     """
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(
+        lambda_stmt(lambda: select(User).where(User.id == user_id))
+    )
     return result.scalar_one_or_none()
 
 
@@ -164,7 +528,12 @@ async def get_active_superuser_count(db: AsyncSession) -> int:
     Returns:
         The number of active superusers.
     """
-    result = await db.execute(
-        select(User).where(User.is_superuser == True, User.is_active == True)  # noqa: E712
+    result = await db.execute(_active_superuser_count_query())
+    return result.scalar_one()
+
+
+def _active_superuser_count_query() -> Select[tuple[int]]:
+    """Build the query counting active superusers."""
+    return (
+        select(func.count()).select_from(User).where(User.is_superuser, User.is_active)
     )
-    return len(list(result.scalars().all()))
@@ -1,5 +1,5 @@
 import os
-from collections.abc import AsyncGenerator
+from typing import Any
 
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -7,14 +7,35 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
 
 # Use test database URL if in test environment
 database_url = os.getenv("TEST_DATABASE_URL", settings.DATABASE_URL)
 
+pool_options: dict[str, Any]
+if settings.DB_USE_NULL_POOL:
+    # PgBouncer in transaction mode multiplexes server connections, so pooling
+    # here is redundant and asyncpg's per-connection statement cache is unsafe
+    pool_options = {
+        "poolclass": NullPool,
+        "connect_args": {"statement_cache_size": 0},
+    }
+else:
+    pool_options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
 engine: AsyncEngine = create_async_engine(
-    database_url, echo=settings.DEBUG, future=True
+    database_url,
+    echo=settings.DEBUG,
+    future=True,
+    **pool_options,
 )
 
 AsyncSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
@@ -25,16 +46,23 @@ AsyncSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
     autoflush=False,
 )
 
+# Read-only endpoints use a replica when one is configured, keeping their
+# connections out of the primary's pool
+read_engine: AsyncEngine = (
+    create_async_engine(
+        settings.DATABASE_READ_URL,
+        echo=settings.DEBUG,
+        future=True,
+        **pool_options,
+    )
+    if settings.DATABASE_READ_URL
+    else engine
+)
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """
-    Dependency for getting async database session.
-
-    Yields:
-        AsyncSession: The database session.
-    """
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+ReadSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
@@ -1,27 +1,125 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from prometheus_client import Gauge, make_asgi_app
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.api.v1.endpoints import users as user_endpoints
 from app.api.v1.router import api_router
-from app.core.config import settings
+from app.core import security
+from app.core.config import CORS_ORIGINS, settings
 from app.core.exceptions import configure_exceptions
+from app.crud import user as user_crud
+from app.db.session import engine, read_engine
+
+# TTLCache only drops expired entries when it is written to, so an idle
+# process would otherwise keep stale tokens and password checks in memory
+CACHE_SWEEP_INTERVAL_SECONDS = 60
+
+CACHE_ENTRIES = Gauge(
+    "auth_cache_entries",
+    "Unexpired entries in the in-process auth caches, as of the last sweep.",
+    ["cache"],
+)
+
+
+def _sweep_caches() -> None:
+    """Evict expired entries from the auth caches and publish their sizes."""
+    for expire_caches in (
+        security.expire_caches,
+        user_endpoints.expire_caches,
+        user_crud.expire_caches,
+    ):
+        for cache, size in expire_caches().items():
+            CACHE_ENTRIES.labels(cache=cache).set(size)
+
+
+async def _sweep_expired_cache_entries() -> None:
+    """Periodically evict expired entries from the in-process auth caches."""
+    while True:
+        await asyncio.sleep(CACHE_SWEEP_INTERVAL_SECONDS)
+        _sweep_caches()
+
+
+async def _warm_connection_pool() -> None:
+    """
+    Open the pool's steady-state connections before serving requests.
+
+    Connections are opened concurrently and returned to the pool, so the first
+    requests after startup do not pay for connection setup. An unreachable
+    database is reported by the health check instead.
+    """
+    size = 1 if settings.DB_USE_NULL_POOL else settings.DB_POOL_SIZE
+    results = await asyncio.gather(
+        *(engine.connect().start() for _ in range(size)),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            if not isinstance(result, OSError | SQLAlchemyError):
+                raise result
+            continue
+        await result.close()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Run background tasks for the lifetime of the application.
+
+    Args:
+        app: The FastAPI application.
+
+    Yields:
+        None: Control back to the server while the application runs.
+    """
+    await _warm_connection_pool()
+
+    # Build the OpenAPI schema now rather than on the first docs request
+    app.openapi()
+
+    sweeper = asyncio.create_task(_sweep_expired_cache_entries())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sweeper
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     version=settings.VERSION,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Set CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[str(origin) for origin in settings.BACKEND_CORS_ORIGINS],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress larger responses such as user listings; small bodies are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Configure exception handlers
 configure_exceptions(app)
 
 # Include routers
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+# Prometheus scrape endpoint, including the cache size gauges
+app.mount("/metrics", make_asgi_app())
@@ -1,6 +1,7 @@
 import uuid
+from datetime import datetime
 
-from sqlalchemy import UUID, Boolean, String
+from sqlalchemy import UUID, Boolean, DateTime, Index, String, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base_class import Base
@@ -17,9 +18,20 @@ class User(Base):
         hashed_password: Hashed version of user's password
         is_active: Whether the user account is active
         is_superuser: Whether the user has superuser privileges
+        token_invalidated_at: Tokens issued before this time are rejected
+        updated_at: When the user row was last modified
     """
 
     __tablename__ = "users"
+    __table_args__ = (
+        # Lets the last-superuser guard count active superusers without
+        # scanning the whole table
+        Index(
+            "ix_users_active_superusers",
+            "id",
+            postgresql_where=text("is_superuser AND is_active"),
+        ),
+    )
 
     # Required fields (no defaults)
     id: Mapped[uuid.UUID] = mapped_column(
@@ -55,3 +67,14 @@ class User(Base):
         default=False,
         nullable=False,
     )
+    token_invalidated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        default=None,
+        nullable=True,
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
@@ -1,15 +1,24 @@
 """Test configuration and fixtures."""
-import asyncio
+import functools
 import os
+import socket
 from collections.abc import AsyncGenerator, Awaitable, Callable, Coroutine, Generator
 from typing import Any, cast
+from unittest.mock import AsyncMock, MagicMock
 
 import psycopg2  # type: ignore
 import pytest
+import pytest_asyncio
+import uvloop
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient
-from pytest_docker.plugin import get_docker_ip, get_docker_services
+from pytest_docker.plugin import (
+    DockerComposeExecutor,
+    get_docker_ip,
+    get_docker_services,
+)
+from sqlalchemy import Result
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -18,9 +27,12 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.pool import NullPool
 
+from app.api.deps import get_db
+from app.core import security
 from app.core.security import create_access_token
 from app.crud.user import create_user
 from app.db.base import Base
+from app.db.session import pool_options
 from app.main import app as fastapi_app
 from app.models.user import User as UserModel
 from app.schemas.user import UserCreate
@@ -31,6 +43,10 @@ os.environ["ENV_FILE"] = ".env.test"
 # Test types
 TEST_TYPES = ["unit", "integration", "regression"]
 
+# Set by pytest-xdist in worker processes; each worker uses its own database
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+TEST_DB_NAME = f"test_{XDIST_WORKER}" if XDIST_WORKER else "test"
+
 
 def pytest_configure(config: pytest.Config) -> None:
     """Configure pytest with custom markers."""
@@ -40,28 +56,101 @@ def pytest_configure(config: pytest.Config) -> None:
         )
 
 
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    """Run every async test in the session event loop shared by the fixtures."""
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if pytest_asyncio.is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy() -> uvloop.EventLoopPolicy:
+    """Run the session event loop on uvloop."""
+    return uvloop.EventLoopPolicy()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def cached_password_hashing() -> Generator[None, None, None]:
+    """
+    Memoize password hashing and verification for the test session.
+
+    Nearly every test hashes the same few passwords, and each Argon2 call costs
+    tens of milliseconds. Reusing a salt across test users is harmless here.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(
+            security,
+            "get_password_hash",
+            functools.lru_cache(maxsize=128)(security.get_password_hash),
+        )
+        mp.setattr(
+            security,
+            "verify_password",
+            functools.lru_cache(maxsize=512)(security.verify_password),
+        )
+        yield
+
+
 @pytest.fixture(scope="session")
 def docker_compose_file(pytestconfig: Any) -> str:
     """Get the docker-compose.yml file path."""
     return os.path.join(str(pytestconfig.rootdir), "docker-compose.test.yml")
 
 
+def _compose_project_name() -> str:
+    """Get the compose project name shared by the controller and its workers."""
+    # xdist workers are child processes of the controlling pytest process
+    return f"pytest{os.getppid() if XDIST_WORKER else os.getpid()}"
+
+
 @pytest.fixture(scope="session")
 def docker_compose_project_name() -> str:
     """Get the docker compose project name."""
-    return f"pytest{os.getpid()}"
+    return _compose_project_name()
 
 
 @pytest.fixture(scope="session")
 def docker_cleanup() -> list[str]:
     """Get the docker cleanup commands."""
-    return ["down -v"]
+    # Workers share the controller's containers, which it tears down at the end
+    return [] if XDIST_WORKER else ["down -v"]
+
+
+def _shared_compose(config: pytest.Config) -> DockerComposeExecutor:
+    """Get a compose executor for the containers shared by xdist workers."""
+    return DockerComposeExecutor(
+        "docker compose",
+        os.path.join(str(config.rootpath), "docker-compose.test.yml"),
+        _compose_project_name(),
+    )
+
+
+def _controls_xdist_workers(config: pytest.Config) -> bool:
+    """Whether this is the controlling process of a parallel (xdist) run."""
+    return not XDIST_WORKER and bool(config.getoption("numprocesses", None))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionstart(session: pytest.Session) -> None:
+    """Start the containers once, before xdist spawns its workers."""
+    # Workers starting the same compose project at once race on the image
+    # build and container names, so they only wait for the database port
+    if _controls_xdist_workers(session.config):
+        _shared_compose(session.config).execute("up --build -d")
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    """Tear down the containers shared by xdist workers."""
+    if _controls_xdist_workers(session.config):
+        _shared_compose(session.config).execute("down -v")
 
 
 @pytest.fixture(scope="session")
 def docker_setup() -> list[str]:
     """Get the docker setup commands."""
-    return ["up --build -d"]
+    # The controller has already started the containers for xdist workers
+    return [] if XDIST_WORKER else ["up --build -d"]
 
 
 @pytest.fixture(scope="session")
@@ -78,6 +167,13 @@ def docker_ip() -> str:
 
 def is_postgres_responsive(host: str, port: int) -> bool:
     """Check if PostgreSQL is responsive."""
+    # A bare TCP probe fails fast while the container is still starting; only
+    # attempt the full handshake once the port accepts connections
+    try:
+        with socket.create_connection((host, port), timeout=0.2):
+            pass
+    except OSError:
+        return False
     try:
         conn = psycopg2.connect(
             dbname="test",
@@ -85,6 +181,7 @@ def is_postgres_responsive(host: str, port: int) -> bool:
             password="postgres",
             host=host,
             port=port,
+            connect_timeout=1,
         )
         conn.close()
         return True
@@ -111,6 +208,24 @@ def docker_services(
         yield services
 
 
+def create_worker_database(host: str, port: int) -> None:
+    """Recreate this xdist worker's database next to the default one."""
+    conn = psycopg2.connect(
+        dbname="test",
+        user="postgres",
+        password="postgres",
+        host=host,
+        port=port,
+    )
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{TEST_DB_NAME}"')
+            cursor.execute(f'CREATE DATABASE "{TEST_DB_NAME}"')
+    finally:
+        conn.close()
+
+
 @pytest.fixture(scope="session")
 def postgres_service(docker_services: Any, docker_ip: str) -> str:
     """Ensure that PostgreSQL service is up and responsive."""
@@ -118,29 +233,32 @@ def postgres_service(docker_services: Any, docker_ip: str) -> str:
     docker_services.wait_until_responsive(
         timeout=30.0, pause=0.1, check=lambda: is_postgres_responsive(docker_ip, port)
     )
-    return f"postgresql+asyncpg://postgres:postgres@{docker_ip}:{port}/test"
-
-
-@pytest.fixture(scope="session")
-def app(postgres_service: str) -> FastAPI:
-    """Get the FastAPI application."""
-    # Set the database URL for the app
-    os.environ["DATABASE_URL"] = postgres_service
-    return fastapi_app
+    if XDIST_WORKER:
+        create_worker_database(docker_ip, port)
+    return f"postgresql+asyncpg://postgres:postgres@{docker_ip}:{port}/{TEST_DB_NAME}"
 
 
 @pytest.fixture(scope="session")
-def anyio_backend() -> str:
-    """Return the backend to use for anyio."""
-    return "asyncio"
+async def app(postgres_service: str) -> AsyncGenerator[FastAPI, None]:
+    """Get the FastAPI application, serving requests from the test database."""
+    engine = create_async_engine(postgres_service, **pool_options)
+    session_factory = async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+    )
 
+    async def get_test_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as session, session.begin():
+            yield session
 
-@pytest.fixture(scope="session")
-def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
-    """Create an instance of the default event loop for each test case."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+    fastapi_app.dependency_overrides[get_db] = get_test_db
+    try:
+        yield fastapi_app
+    finally:
+        fastapi_app.dependency_overrides.clear()
+        await engine.dispose()
 
 
 @pytest.fixture(scope="session")
@@ -167,17 +285,45 @@ async def test_engine(postgres_service: str) -> AsyncGenerator[AsyncEngine, None
 
 
 @pytest.fixture
-async def db_session(test_engine: AsyncEngine) -> AsyncGenerator[AsyncSession, None]:
+async def teardown_checks() -> AsyncGenerator[list[Callable[[], Awaitable[Any]]], None]:
+    """
+    Run registered cleanups after each test, even when some of them fail.
+
+    Fixtures append async cleanup callables; they run in reverse order of
+    registration and any failures are raised together once all have run.
+
+    Yields:
+        The list of cleanup callables to run at teardown.
+    """
+    cleanups: list[Callable[[], Awaitable[Any]]] = []
+    yield cleanups
+
+    errors: list[Exception] = []
+    for cleanup in reversed(cleanups):
+        try:
+            await cleanup()
+        except Exception as exc:
+            errors.append(exc)
+    if errors:
+        raise ExceptionGroup("test teardown failed", errors)
+
+
+@pytest.fixture
+async def db_session(
+    test_engine: AsyncEngine,
+    teardown_checks: list[Callable[[], Awaitable[Any]]],
+) -> AsyncSession:
     """
     Get a test database session.
 
-    This fixture provides a database session for testing.
-    The session is closed after each test.
+    This fixture provides a database session for testing. Any open
+    transaction is rolled back and the session is closed after each test.
 
     Args:
         test_engine: The test database engine.
+        teardown_checks: Cleanups run after the test.
 
-    Yields:
+    Returns:
         An async database session.
     """
     # Create a new session for each test
@@ -189,11 +335,29 @@ async def db_session(test_engine: AsyncEngine) -> AsyncGenerator[AsyncSession, N
         autoflush=False,
     )
 
-    async with testing_session_local() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    session = testing_session_local()
+    # The close is registered first so it still runs if the rollback fails
+    teardown_checks.append(session.close)
+    teardown_checks.append(session.rollback)
+    return session
+
+
+@pytest.fixture
+def mock_db_session() -> AsyncMock:
+    """
+    Get a stand-in session for unit tests that do not need real SQL.
+
+    ``execute`` returns a result whose scalar lookups find no rows, so these
+    tests run without the database container.
+
+    Returns:
+        A mock constrained to the ``AsyncSession`` interface.
+    """
+    result = MagicMock(spec=Result)
+    result.scalar_one_or_none.return_value = None
+    session = AsyncMock(spec=AsyncSession)
+    session.execute.return_value = result
+    return session
 
 
 @pytest.fixture(scope="session")
@@ -203,11 +367,11 @@ def client(app: FastAPI) -> Generator[TestClient, None, None]:
         yield c
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 async def async_client(
     app: FastAPI, test_engine: AsyncEngine
 ) -> AsyncGenerator[AsyncClient, None]:
-    """Create an async client for testing."""
+    """Create an async client shared by every test in the session."""
     # Cast the app to the expected ASGI application type
     asgi_callable = Callable[
         [
@@ -224,6 +388,37 @@ async def async_client(
         yield client
 
 
+# Validated once; variants are copied from it without re-running validation
+_USER_TEMPLATE = UserCreate(
+    email="template@example.com",
+    password="testpassword",
+    full_name="Test User",
+)
+
+
+@pytest.fixture
+def user_factory(
+    db_session: AsyncSession,
+) -> Callable[..., Awaitable[UserModel]]:
+    """
+    Get a factory that creates and commits users.
+
+    Args:
+        db_session: The test database session.
+
+    Returns:
+        An async callable taking an email plus ``UserCreate`` field overrides.
+    """
+
+    async def make(email: str, **overrides: Any) -> UserModel:
+        user_in = _USER_TEMPLATE.model_copy(update={"email": email, **overrides})
+        db_user = await create_user(db_session, user_in)
+        await db_session.commit()
+        return db_user
+
+    return make
+
+
 @pytest.fixture
 def test_user_data() -> dict[str, Any]:
     """Get test user data."""
@@ -247,6 +442,24 @@ async def test_user(
     return db_user
 
 
+@pytest.fixture(scope="session")
+def auth_headers_for() -> Callable[[str], dict[str, str]]:
+    """
+    Get a factory for bearer headers, signing each subject's token only once.
+
+    Returns:
+        A callable taking a subject email and returning request headers.
+    """
+    token_for = functools.lru_cache(maxsize=64)(
+        lambda subject: create_access_token(subject=subject)
+    )
+
+    def make(subject: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {token_for(subject)}"}
+
+    return make
+
+
 @pytest.fixture
 def test_user_token(test_user: UserModel) -> str:
     """Get a test user token."""
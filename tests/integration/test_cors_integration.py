@@ -0,0 +1,19 @@
+"""Integration tests for CORS handling."""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from app.core.config import CORS_ORIGINS
+
+
+@pytest.mark.integration
+async def test_preflight_allows_configured_origin(async_client: AsyncClient) -> None:
+    """Test that a configured origin passes the CORS preflight check."""
+    origin = CORS_ORIGINS[0]
+    response = await async_client.options(
+        "/api/v1/health",
+        headers={"Origin": origin, "Access-Control-Request-Method": "GET"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["access-control-allow-origin"] == origin
@@ -1,12 +1,14 @@
 """Integration tests for user-related functionality."""
 
+from collections.abc import Awaitable, Callable
+
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import create_access_token
-from app.crud.user import create_user
+from app.crud.user import create_users
+from app.models.user import User as UserModel
 from app.schemas.user import UserCreate
 
 # Constants
@@ -41,29 +43,20 @@ async def test_create_user_api_flow(
 
 @pytest.mark.integration
 async def test_user_authentication_flow(
-    async_client: AsyncClient, db_session: AsyncSession
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
 ) -> None:
     """Test complete user authentication flow."""
-    # Create test user
-    user_in = UserCreate(
-        email="auth_test@example.com",
-        password="testpassword",
-        full_name="Auth Test User",
-        is_active=True,
-        is_superuser=False,
-    )
-    db_user = await create_user(db_session, user_in)
-    await db_session.commit()
+    db_user = await user_factory("auth_test@example.com")
 
-    # Generate access token
-    access_token = create_access_token(subject=db_user.email)
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = auth_headers_for(db_user.email)
 
     # Test accessing protected endpoint
     response = await async_client.get("/api/v1/users/me", headers=headers)
     assert response.status_code == status.HTTP_200_OK
     user_data = response.json()
-    assert user_data["email"] == user_in.email
+    assert user_data["email"] == db_user.email
 
 
 @pytest.mark.integration
@@ -71,16 +64,18 @@ async def test_user_list_pagination(
     async_client: AsyncClient, db_session: AsyncSession
 ) -> None:
     """Test user listing with pagination."""
-    # Create multiple test users
-    for i in range(MIN_TEST_USERS):
-        user_in = UserCreate(
-            email=f"list_test_{i}@example.com",
-            password="testpassword",
-            full_name=f"List Test User {i}",
-            is_active=True,
-            is_superuser=False,
-        )
-        await create_user(db_session, user_in)
+    # Create multiple test users; the rows are known-valid, so skip validation
+    await create_users(
+        db_session,
+        [
+            UserCreate.model_construct(
+                email=f"list_test_{i}@example.com",
+                password="testpassword",
+                full_name=f"List Test User {i}",
+            )
+            for i in range(MIN_TEST_USERS)
+        ],
+    )
     await db_session.commit()
 
     # Test listing users
@@ -90,26 +85,37 @@ async def test_user_list_pagination(
     assert isinstance(users, list)
     assert len(users) >= MIN_TEST_USERS  # At least our test users should be present
 
+    # Pages are bounded by limit and do not overlap
+    first = await async_client.get("/api/v1/users/", params={"limit": 1})
+    second = await async_client.get("/api/v1/users/", params={"limit": 1, "offset": 1})
+    assert first.status_code == HTTP_200_OK
+    assert second.status_code == HTTP_200_OK
+    assert len(first.json()) == 1
+    assert len(second.json()) == 1
+    assert first.json()[0]["id"] != second.json()[0]["id"]
+
+    # Keyset cursor yields the same page as the equivalent offset
+    response = await async_client.get(
+        "/api/v1/users/", params={"limit": 1, "after": first.json()[0]["id"]}
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == second.json()
+
+    # Oversized pages are rejected
+    response = await async_client.get("/api/v1/users/", params={"limit": 1001})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
 
 @pytest.mark.integration
 async def test_user_update_flow(
-    async_client: AsyncClient, db_session: AsyncSession
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
 ) -> None:
     """Test user update flow."""
-    # Create test user
-    user_in = UserCreate(
-        email="update_test@example.com",
-        password="testpassword",
-        full_name="Update Test User",
-        is_active=True,
-        is_superuser=False,
-    )
-    db_user = await create_user(db_session, user_in)
-    await db_session.commit()
+    db_user = await user_factory("update_test@example.com")
 
-    # Generate access token
-    access_token = create_access_token(subject=db_user.email)
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = auth_headers_for(db_user.email)
 
     # Test updating user
     update_data = {"full_name": "Updated Name"}
@@ -119,3 +125,70 @@ async def test_user_update_flow(
     assert response.status_code == status.HTTP_200_OK
     updated_user = response.json()
     assert updated_user["full_name"] == update_data["full_name"]
+
+
+@pytest.mark.integration
+async def test_user_etag_flow(
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
+) -> None:
+    """Test conditional GETs on user details."""
+    db_user = await user_factory("etag_test@example.com")
+    headers = auth_headers_for(db_user.email)
+
+    response = await async_client.get("/api/v1/users/me", headers=headers)
+    assert response.status_code == HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    # Same ETag on the by-ID endpoint, and an unchanged user is not resent
+    response = await async_client.get(
+        f"/api/v1/users/{db_user.id}",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    # Updating the user invalidates the ETag
+    response = await async_client.patch(
+        f"/api/v1/users/{db_user.id}",
+        headers=headers,
+        json={"full_name": "Renamed ETag User"},
+    )
+    assert response.status_code == HTTP_200_OK
+    response = await async_client.get(
+        "/api/v1/users/me", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json()["full_name"] == "Renamed ETag User"
+
+
+@pytest.mark.integration
+async def test_list_users_gzip(
+    async_client: AsyncClient, db_session: AsyncSession
+) -> None:
+    """Test that large user listings are gzip-compressed for capable clients."""
+    await create_users(
+        db_session,
+        [
+            UserCreate(
+                email=f"gzip_{i}@example.com",
+                password="testpassword",
+                full_name=f"Gzip Test User {i}",
+            )
+            for i in range(10)
+        ],
+    )
+    await db_session.commit()
+
+    response = await async_client.get(
+        "/api/v1/users/",
+        params={"limit": 1000},
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    emails = {user["email"] for user in response.json()}
+    assert "gzip_9@example.com" in emails
@@ -1,17 +1,21 @@
 """Regression tests for user-related functionality."""
 import asyncio
+from collections.abc import Awaitable, Callable
+from uuid import uuid4
 
 import pytest
 from fastapi import status
 from httpx import AsyncClient, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import create_access_token
-from app.crud.user import create_user, get_user_by_email
-from app.schemas.user import UserCreate
+from app.crud.user import get_user_by_email
+from app.models.user import User as UserModel
 
 # Constants
-MAX_CONCURRENT_REQUESTS = 3
+MAX_CONCURRENT_REQUESTS = 32
+# Stay within the app's default connection pool so requests race on the
+# unique constraint rather than queue for connections
+MAX_IN_FLIGHT_REQUESTS = 16
 HTTP_401_UNAUTHORIZED = status.HTTP_401_UNAUTHORIZED
 HTTP_200_OK = status.HTTP_200_OK
 HTTP_201_CREATED = status.HTTP_201_CREATED
@@ -30,14 +34,15 @@ async def test_concurrent_user_creation(
         "is_superuser": False,
     }
 
+    in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_REQUESTS)
+
+    async def post_user() -> Response:
+        async with in_flight:
+            return await async_client.post("/api/v1/users/", json=user_data)
+
     # Simulate concurrent requests
-    responses = await asyncio.gather(
-        *[
-            async_client.post("/api/v1/users/", json=user_data)
-            for _ in range(MAX_CONCURRENT_REQUESTS)
-        ],
-        return_exceptions=True,
-    )
+    tasks = [asyncio.create_task(post_user()) for _ in range(MAX_CONCURRENT_REQUESTS)]
+    responses = await asyncio.gather(*tasks, return_exceptions=True)
 
     # Only one request should succeed
     success_count = sum(
@@ -55,23 +60,14 @@ async def test_concurrent_user_creation(
 
 @pytest.mark.regression
 async def test_user_session_invalidation(
-    async_client: AsyncClient, db_session: AsyncSession
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
 ) -> None:
     """Test user session handling after password change."""
-    # Create test user
-    user_in = UserCreate(
-        email="session_test@example.com",
-        password="oldpassword",
-        full_name="Session Test User",
-        is_active=True,
-        is_superuser=False,
-    )
-    db_user = await create_user(db_session, user_in)
-    await db_session.commit()  # Commit the transaction
+    db_user = await user_factory("session_test@example.com", password="oldpassword")
 
-    # Generate initial access token
-    old_token = create_access_token(subject=db_user.email)
-    headers = {"Authorization": f"Bearer {old_token}"}
+    headers = auth_headers_for(db_user.email)
 
     # Change password
     new_password = "newpassword"
@@ -89,34 +85,17 @@ async def test_user_session_invalidation(
 
 @pytest.mark.regression
 async def test_user_deactivation_flow(
-    async_client: AsyncClient, db_session: AsyncSession
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
 ) -> None:
     """Test complete user deactivation flow."""
-    # Create test user (as superuser)
-    user_in = UserCreate(
-        email="deactivate_test@example.com",
-        password="testpassword",
-        full_name="Deactivate Test User",
-        is_active=True,
-        is_superuser=True,  # Make the user a superuser
-    )
-    db_user = await create_user(db_session, user_in)
-    await db_session.commit()  # Commit the transaction
+    db_user = await user_factory("deactivate_test@example.com", is_superuser=True)
 
-    # Generate access token
-    access_token = create_access_token(subject=db_user.email)
-    headers = {"Authorization": f"Bearer {access_token}"}
+    headers = auth_headers_for(db_user.email)
 
     # Create a regular user to deactivate
-    target_user = UserCreate(
-        email="target_user@example.com",
-        password="testpassword",
-        full_name="Target User",
-        is_active=True,
-        is_superuser=False,
-    )
-    target_db_user = await create_user(db_session, target_user)
-    await db_session.commit()  # Commit the transaction
+    target_db_user = await user_factory("target_user@example.com")
 
     # Deactivate user
     response = await async_client.post(
@@ -136,43 +115,124 @@ async def test_user_deactivation_flow(
 
 @pytest.mark.regression
 async def test_user_data_consistency(
-    async_client: AsyncClient, db_session: AsyncSession
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
 ) -> None:
     """Test user data consistency across multiple operations."""
-    # Create initial user
-    user_in = UserCreate(
-        email="consistency_test@example.com",
-        password="testpassword",
-        full_name="Consistency Test User",
-        is_active=True,
-        is_superuser=True,  # Make the user a superuser
+    db_user = await user_factory("consistency_test@example.com", is_superuser=True)
+
+    headers = auth_headers_for(db_user.email)
+
+    url = f"/api/v1/users/{db_user.id}"
+    intermediate = [{"full_name": "Updated Name 1"}, {"full_name": "Updated Name 2"}]
+
+    # Intermediate updates may land in any order; only the last one is asserted
+    responses = await asyncio.gather(
+        *(async_client.patch(url, headers=headers, json=body) for body in intermediate)
     )
-    db_user = await create_user(db_session, user_in)
-    await db_session.commit()  # Commit the transaction
-
-    access_token = create_access_token(subject=db_user.email)
-    headers = {"Authorization": f"Bearer {access_token}"}
-
-    # Perform multiple updates
-    updates = [
-        {"full_name": "Updated Name 1"},
-        {"full_name": "Updated Name 2"},
-        {"full_name": "Final Name"},
-    ]
-
-    for update in updates:
-        response = await async_client.patch(
-            f"/api/v1/users/{db_user.id}",
-            headers=headers,
-            json=update,
-        )
-        if response.status_code != status.HTTP_200_OK:
-            print(f"Update failed: {response.json()}")  # Print error details
-        assert response.status_code == status.HTTP_200_OK
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+
+    response = await async_client.patch(
+        url, headers=headers, json={"full_name": "Final Name"}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.json()
 
     # Verify final state
-    response = await async_client.get(f"/api/v1/users/{db_user.id}", headers=headers)
+    response = await async_client.get(url, headers=headers)
     assert response.status_code == status.HTTP_200_OK
     final_user = response.json()
     assert final_user["full_name"] == "Final Name"
     assert final_user["is_active"] is True
+
+
+@pytest.mark.regression
+async def test_changed_password_is_persisted(
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
+) -> None:
+    """Test that a changed password is committed and usable for login."""
+    db_user = await user_factory("persist_password@example.com", password="oldpassword")
+
+    headers = auth_headers_for(db_user.email)
+    response = await async_client.post(
+        f"/api/v1/users/{db_user.id}/change-password",
+        headers=headers,
+        json={"current_password": "oldpassword", "new_password": "newpassword"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.post(
+        "/api/v1/users/login",
+        data={"username": db_user.email, "password": "newpassword"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.regression
+async def test_login_right_after_password_change(
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
+) -> None:
+    """Test that tokens issued just after a password change are accepted."""
+    db_user = await user_factory("relogin@example.com", password="oldpassword")
+
+    response = await async_client.post(
+        f"/api/v1/users/{db_user.id}/change-password",
+        headers=auth_headers_for(db_user.email),
+        json={"current_password": "oldpassword", "new_password": "newpassword"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # The second login may be served the first one's token
+    for _ in range(2):
+        response = await async_client.post(
+            "/api/v1/users/login",
+            data={"username": db_user.email, "password": "newpassword"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        token = response.json()["access_token"]
+
+        response = await async_client.get(
+            "/api/v1/users/me", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.regression
+async def test_change_password_me_route(
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
+) -> None:
+    """Test that /me/change-password is not shadowed by the user_id route."""
+    db_user = await user_factory("me_password@example.com", password="oldpassword")
+
+    headers = auth_headers_for(db_user.email)
+    response = await async_client.post(
+        "/api/v1/users/me/change-password",
+        headers=headers,
+        json={"current_password": "oldpassword", "new_password": "newpassword"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == str(db_user.id)
+
+
+@pytest.mark.regression
+async def test_get_user_does_not_reveal_existence(
+    async_client: AsyncClient,
+    user_factory: Callable[..., Awaitable[UserModel]],
+    auth_headers_for: Callable[[str], dict[str, str]],
+) -> None:
+    """Test that non-superusers get 403 whether or not the target user exists."""
+    db_user = await user_factory("probe_user@example.com")
+
+    headers = auth_headers_for(db_user.email)
+    response = await async_client.get(f"/api/v1/users/{uuid4()}", headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = await async_client.get(f"/api/v1/users/{db_user.id}", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["email"] == db_user.email
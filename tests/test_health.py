@@ -1,43 +1,40 @@
+import time
+from unittest.mock import AsyncMock
+
 import pytest
-from fastapi import status
+from fastapi import Response, status
 from httpx import AsyncClient
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.v1.endpoints import health
+
 
 @pytest.mark.unit
-@pytest.mark.anyio
-async def test_health_check(async_client: AsyncClient) -> None:
+async def test_health_check(db_session: AsyncSession) -> None:
     """Test the health check endpoint."""
-    response = await async_client.get("/api/v1/health")
+    response = Response()
+    data = await health.health_check(response, db_session)
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
     assert data["status"] == "healthy"
     assert data["database"] == "connected"
 
 
 @pytest.mark.unit
-@pytest.mark.anyio
-async def test_health_check_metrics(async_client: AsyncClient) -> None:
+async def test_health_check_metrics() -> None:
     """Test the health check metrics endpoint."""
-    response = await async_client.get("/api/v1/health/metrics")
-    assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = await health.health_check_metrics()
     assert data["status"] == "operational"
 
 
 @pytest.mark.unit
-@pytest.mark.anyio
-async def test_health_check_readiness(async_client: AsyncClient) -> None:
+async def test_health_check_readiness() -> None:
     """Test the health check readiness endpoint."""
-    response = await async_client.get("/api/v1/health/readiness")
-    assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = await health.health_check_readiness()
     assert data["status"] == "ready"
 
 
 @pytest.mark.integration
-@pytest.mark.anyio
 async def test_db_connection(db_session: AsyncSession) -> None:
     """Test database connection."""
     result = await db_session.execute(text("SELECT 1"))
@@ -45,7 +42,6 @@ async def test_db_connection(db_session: AsyncSession) -> None:
 
 
 @pytest.mark.integration
-@pytest.mark.anyio
 async def test_health_check_unhealthy(async_client: AsyncClient) -> None:
     """Test health check when database is unhealthy."""
     # TODO: Mock database to be down
@@ -55,3 +51,17 @@ async def test_health_check_unhealthy(async_client: AsyncClient) -> None:
     data = response.json()
     assert data["status"] == "healthy"
     assert data["database"] == "connected"
+
+
+@pytest.mark.unit
+async def test_health_check_reuses_recent_probe(
+    mock_db_session: AsyncMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a recent probe result is served without querying again."""
+    monkeypatch.setattr(health, "_last_probe", (time.monotonic(), False))
+    response = Response()
+    data = await health.health_check(response, mock_db_session)
+    mock_db_session.execute.assert_not_called()
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert data["status"] == "unhealthy"
+    assert data["database"] == "disconnected"
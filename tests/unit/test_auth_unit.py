@@ -0,0 +1,146 @@
+"""Unit tests for authentication helpers."""
+from datetime import timedelta
+from unittest.mock import patch
+
+import bcrypt
+import jwt
+import pytest
+from fastapi import HTTPException, status
+from prometheus_client import REGISTRY
+from starlette.requests import Request
+
+from app import main
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.core.security import (
+    create_access_token,
+    decode_access_token,
+    get_password_hash,
+    verify_password,
+)
+
+
+def _request(headers: list[tuple[bytes, bytes]]) -> Request:
+    """Build a bare request carrying the given raw headers."""
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.mark.unit
+def test_cached_decode_reuses_payload() -> None:
+    """Test that a repeat token is served from the decode cache."""
+    token = create_access_token(subject="cache_test@example.com")
+
+    first = decode_access_token(token)
+    with patch.object(security, "_verify_access_token") as verify:
+        second = decode_access_token(token)
+
+    verify.assert_not_called()
+    assert first["sub"] == "cache_test@example.com"
+    assert second == first
+
+
+@pytest.mark.unit
+def test_cached_decode_isolates_callers() -> None:
+    """Test that changing a decoded payload does not leak into the cache."""
+    token = create_access_token(subject="isolated@example.com")
+
+    first = decode_access_token(token)
+    first["sub"] = "intruder@example.com"
+    second = decode_access_token(token)
+    second["extra"] = True
+    third = decode_access_token(token)
+
+    assert third["sub"] == "isolated@example.com"
+    assert "extra" not in third
+
+
+@pytest.mark.unit
+async def test_bearer_scheme_extracts_token() -> None:
+    """Test that the bearer scheme accepts any casing of the prefix."""
+    request = _request([(b"authorization", b"bEaReR abc.def")])
+
+    assert await deps.oauth2_scheme(request) == "abc.def"
+
+
+@pytest.mark.unit
+async def test_bearer_scheme_rejects_other_schemes() -> None:
+    """Test that non-bearer credentials are rejected with 401."""
+    request = _request([(b"authorization", b"Basic abc")])
+
+    with pytest.raises(HTTPException) as exc_info:
+        await deps.oauth2_scheme(request)
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert exc_info.value.headers == {"WWW-Authenticate": "Bearer"}
+
+
+@pytest.mark.unit
+def test_password_hashing_uses_argon2_and_accepts_bcrypt() -> None:
+    """Test that new hashes are Argon2id while bcrypt hashes still verify."""
+    hashed = get_password_hash("testpassword")
+    legacy = bcrypt.hashpw(b"testpassword", bcrypt.gensalt()).decode()
+
+    assert hashed.startswith("$argon2id$")
+    assert verify_password("testpassword", hashed)
+    assert verify_password("testpassword", legacy)
+    assert not verify_password("wrongpassword", legacy)
+
+
+@pytest.mark.unit
+def test_decode_rejects_tampered_token() -> None:
+    """Test that a token with a modified signature is rejected with 401."""
+    token = create_access_token(subject="tamper_test@example.com")
+    header, payload, signature = token.split(".")
+    tampered = f"{header}.{payload}.{signature[::-1]}"
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_access_token(tampered)
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.unit
+def test_tokens_interoperate_with_pyjwt() -> None:
+    """Test that issued tokens are standard JWTs and PyJWT tokens are accepted."""
+    token = create_access_token(subject="interop@example.com")
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    assert claims["sub"] == "interop@example.com"
+
+    foreign = jwt.encode(
+        {**claims, "sub": "foreign@example.com", "aud": "other"},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+    with pytest.raises(HTTPException):
+        decode_access_token(foreign)  # PyJWT rejects the unexpected audience
+
+
+@pytest.mark.unit
+def test_decode_rejects_expired_token() -> None:
+    """Test that an expired token is rejected with 401."""
+    token = create_access_token(
+        subject="expired@example.com", expires_delta=timedelta(seconds=-1)
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_access_token(token)
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.unit
+def test_cache_sweep_publishes_sizes() -> None:
+    """Test that the cache sweeper exports each cache's size as a gauge."""
+    decode_access_token(create_access_token(subject="gauge@example.com"))
+
+    main._sweep_caches()
+
+    decoded = REGISTRY.get_sample_value(
+        "auth_cache_entries", {"cache": "decoded_tokens"}
+    )
+    assert decoded is not None
+    assert decoded >= 1
+    for cache in ("verified_passwords", "issued_tokens", "login_credentials"):
+        assert REGISTRY.get_sample_value("auth_cache_entries", {"cache": cache}) >= 0
+    assert REGISTRY.get_sample_value("auth_cache_entries", {"cache": "auth_users"}) >= 0
@@ -1,43 +1,62 @@
 """Unit tests for user-related functionality."""
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from unittest.mock import AsyncMock
+
 import pytest
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import ValidationError
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
 
+from app.api.deps import get_current_user
 from app.api.v1.endpoints.users import login
-from app.crud.user import create_user, get_user_by_email
-from app.schemas.user import UserCreate
+from app.core.security import create_access_token, get_password_hash
+from app.crud.user import (
+    create_user,
+    create_users,
+    get_login_credentials,
+    get_user_by_email,
+    get_user_for_auth,
+    update_user,
+    update_user_by_id,
+)
+from app.models.user import User as UserModel
+from app.schemas.user import UserCreate, UserUpdate
 
 # Constants
 HTTP_400_BAD_REQUEST = status.HTTP_400_BAD_REQUEST
 HTTP_401_UNAUTHORIZED = status.HTTP_401_UNAUTHORIZED
 
 
+def _request() -> Request:
+    """Build a bare request for calling dependencies directly."""
+    return Request({"type": "http", "headers": []})
+
+
 @pytest.mark.unit
-async def test_create_user_handler_validation() -> None:
+@pytest.mark.parametrize(
+    ("email", "password", "message"),
+    [
+        ("invalid-email", "testpassword", "value is not a valid email address"),
+        ("test@example.com", "short", "String should have at least 8 characters"),
+    ],
+)
+def test_create_user_handler_validation(
+    email: str, password: str, message: str
+) -> None:
     """Test user creation input validation."""
-    # Test with invalid email
     with pytest.raises(ValidationError) as exc_info:
         UserCreate(
-            email="invalid-email",
-            password="testpassword",
+            email=email,
+            password=password,
             full_name="Test User",
             is_active=True,
             is_superuser=False,
         )
-    assert "value is not a valid email address" in str(exc_info.value)
-
-    # Test with short password
-    with pytest.raises(ValidationError) as exc_info:
-        UserCreate(
-            email="test@example.com",
-            password="short",  # too short
-            full_name="Test User",
-            is_active=True,
-            is_superuser=False,
-        )
-    assert "String should have at least 8 characters" in str(exc_info.value)
+    assert message in str(exc_info.value)
 
 
 @pytest.mark.unit
@@ -63,10 +82,11 @@ async def test_create_user_duplicate_email(db_session: AsyncSession) -> None:
 
 
 @pytest.mark.unit
-async def test_get_user_by_email_not_found(db_session: AsyncSession) -> None:
+async def test_get_user_by_email_not_found(mock_db_session: AsyncMock) -> None:
     """Test getting non-existent user by email."""
-    user = await get_user_by_email(db_session, "nonexistent@example.com")
+    user = await get_user_by_email(mock_db_session, "nonexistent@example.com")
     assert user is None
+    mock_db_session.execute.assert_awaited_once()
 
 
 @pytest.mark.unit
@@ -110,6 +130,149 @@ async def test_login_success(db_session: AsyncSession) -> None:
     assert token.token_type == "bearer"
 
 
+@pytest.mark.unit
+async def test_login_reuses_recent_token(db_session: AsyncSession) -> None:
+    """Test that back-to-back logins are served the same signed token."""
+    user_data = UserCreate(
+        email="repeat_login@example.com",
+        password="testpassword",
+        full_name="Repeat Login User",
+        is_active=True,
+        is_superuser=False,
+    )
+    await create_user(db_session, user_data)
+    form_data = OAuth2PasswordRequestForm(
+        username=user_data.email,
+        password=user_data.password,
+        scope="",
+        grant_type="password",
+    )
+
+    first = await login(form_data, db_session)
+    second = await login(form_data, db_session)
+
+    assert second.access_token == first.access_token
+
+
+@pytest.mark.unit
+async def test_login_cache_evicted_on_password_change(
+    db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that cached login credentials do not outlive a password change."""
+    user_data = UserCreate(
+        email="cached_login@example.com",
+        password="testpassword",
+        full_name="Cached Login User",
+        is_active=True,
+        is_superuser=False,
+    )
+    db_user = await create_user(db_session, user_data)
+    await db_session.commit()
+    new_hash = get_password_hash("newpassword")
+
+    def form(password: str) -> OAuth2PasswordRequestForm:
+        return OAuth2PasswordRequestForm(
+            username=user_data.email, password=password, scope="", grant_type="password"
+        )
+
+    async with AsyncSession(db_session.bind) as reader:
+        await update_user_by_id(db_session, db_user.id, {"hashed_password": new_hash})
+        # The writing session sees its change without caching it early
+        credentials = await get_login_credentials(db_session, user_data.email)
+        assert credentials is not None
+        assert credentials.hashed_password == new_hash
+
+        # A concurrent login reads the old row, then the change commits before
+        # the lookup returns; what it read must not be cached
+        lookup = reader.execute
+
+        async def lookup_then_commit(*args: Any, **kwargs: Any) -> Any:
+            result = await lookup(*args, **kwargs)
+            await db_session.commit()
+            return result
+
+        monkeypatch.setattr(reader, "execute", lookup_then_commit)
+        assert (await login(form("testpassword"), reader)).access_token
+        monkeypatch.undo()
+        await reader.rollback()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await login(form("testpassword"), reader)
+        assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
+        assert (await login(form("newpassword"), reader)).access_token
+
+
+@pytest.mark.unit
+async def test_auth_lookup_cached_and_evicted(db_session: AsyncSession) -> None:
+    """Test that cached auth lookups attach to the session and see updates."""
+    user_data = UserCreate(
+        email="cached_auth@example.com",
+        password="testpassword",
+        full_name="Cached Auth User",
+        is_active=True,
+        is_superuser=False,
+    )
+    db_user = await create_user(db_session, user_data)
+    await db_session.commit()
+    await get_user_for_auth(db_session, user_data.email)
+    db_session.expunge_all()
+
+    cached = await get_user_for_auth(db_session, user_data.email)
+    assert cached is not None
+    assert cached.id == db_user.id
+    assert cached in db_session
+    await db_session.refresh(cached, ["hashed_password"])
+    assert cached.hashed_password == db_user.hashed_password
+
+    # A concurrent request reading before the deactivation commits must not
+    # leave the old row cached afterwards
+    async with AsyncSession(db_session.bind) as reader:
+        await update_user_by_id(db_session, db_user.id, {"is_active": False})
+        before_commit = await get_user_for_auth(reader, user_data.email)
+        assert before_commit is not None
+        assert before_commit.is_active
+        reader.expunge_all()
+
+        await db_session.commit()
+        await reader.rollback()
+        updated = await get_user_for_auth(reader, user_data.email)
+        assert updated is not None
+        assert not updated.is_active
+
+
+@pytest.mark.unit
+async def test_auth_lookup_sees_revocation_from_other_workers(
+    db_session: AsyncSession,
+) -> None:
+    """Test that cached auth lookups read access and privilege columns fresh."""
+    user_data = UserCreate(
+        email="other_worker@example.com",
+        password="testpassword",
+        full_name="Other Worker",
+        is_active=True,
+        is_superuser=True,
+    )
+    db_user = await create_user(db_session, user_data)
+    await db_session.commit()
+    assert await get_user_for_auth(db_session, user_data.email) is not None
+    db_session.expunge_all()
+
+    # Another worker commits the change, so this process's cache is not evicted
+    cutoff = datetime.now(UTC)
+    await db_session.execute(
+        update(UserModel)
+        .where(UserModel.id == db_user.id)
+        .values(is_active=False, is_superuser=False, token_invalidated_at=cutoff)
+    )
+    await db_session.commit()
+
+    cached = await get_user_for_auth(db_session, user_data.email)
+    assert cached is not None
+    assert not cached.is_active
+    assert not cached.is_superuser
+    assert cached.token_invalidated_at == cutoff
+
+
 @pytest.mark.unit
 async def test_login_invalid_credentials(db_session: AsyncSession) -> None:
     """Test login with invalid credentials."""
@@ -172,3 +335,147 @@ async def test_login_inactive_user(db_session: AsyncSession) -> None:
         await login(form_data, db_session)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "User is inactive" in str(exc_info.value.detail)
+
+
+@pytest.mark.unit
+async def test_session_invalidation_uses_app_clock(db_session: AsyncSession) -> None:
+    """Test that the token cutoff is taken from the app clock at update time."""
+    user_data = UserCreate(
+        email="invalidation_clock@example.com",
+        password="testpassword",
+        full_name="Invalidation Clock",
+        is_active=True,
+        is_superuser=False,
+    )
+    db_user = await create_user(db_session, user_data)
+
+    before = datetime.now(UTC)
+    updated = await update_user_by_id(
+        db_session, db_user.id, {}, invalidate_sessions=True
+    )
+    after = datetime.now(UTC)
+
+    assert updated is not None
+    assert updated.token_invalidated_at is not None
+    assert before <= updated.token_invalidated_at <= after
+
+
+@pytest.mark.unit
+async def test_session_invalidation_orders_tokens_within_a_second(
+    db_session: AsyncSession,
+) -> None:
+    """Test that tokens in the cutoff's second are judged by sub-second iat."""
+    user_data = UserCreate(
+        email="invalidation_second@example.com",
+        password="testpassword",
+        full_name="Invalidation Second",
+        is_active=True,
+        is_superuser=False,
+    )
+    db_user = await create_user(db_session, user_data)
+    cutoff = datetime.now(UTC).replace(microsecond=500_000) - timedelta(seconds=5)
+    await update_user_by_id(db_session, db_user.id, {"token_invalidated_at": cutoff})
+
+    before = create_access_token(
+        subject=user_data.email, issued_at=cutoff.timestamp() - 0.25
+    )
+    after = create_access_token(
+        subject=user_data.email, issued_at=cutoff.timestamp() + 0.25
+    )
+
+    user = await get_current_user(_request(), after, db_session)
+    assert user.id == db_user.id
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(_request(), before, db_session)
+    assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.unit
+async def test_update_keeps_last_superuser(db_session: AsyncSession) -> None:
+    """Test that guarded updates cannot remove the last active superuser."""
+    # Leave the new superuser as the only active one in this transaction
+    await db_session.execute(
+        update(UserModel).where(UserModel.is_superuser).values(is_active=False)
+    )
+    superuser = await create_user(
+        db_session,
+        UserCreate(
+            email="last_superuser@example.com",
+            password="testpassword",
+            full_name="Last Superuser",
+            is_superuser=True,
+        ),
+    )
+
+    assert (
+        await update_user_by_id(
+            db_session, superuser.id, {"is_active": False}, keep_last_superuser=True
+        )
+        is None
+    )
+
+    await create_user(
+        db_session,
+        UserCreate(
+            email="second_superuser@example.com",
+            password="testpassword",
+            full_name="Second Superuser",
+            is_superuser=True,
+        ),
+    )
+    updated = await update_user_by_id(
+        db_session, superuser.id, {"is_active": False}, keep_last_superuser=True
+    )
+    assert updated is not None
+    assert not updated.is_active
+
+
+@pytest.mark.unit
+async def test_update_user_rejects_taken_email(db_session: AsyncSession) -> None:
+    """Test that changing to a registered email is rejected by the unique index."""
+    taken = await create_user(
+        db_session,
+        UserCreate(
+            email="taken_email@example.com",
+            password="testpassword",
+            full_name="Taken Email User",
+        ),
+    )
+    db_user = await create_user(
+        db_session,
+        UserCreate(
+            email="email_change@example.com",
+            password="testpassword",
+            full_name="Email Change User",
+        ),
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        await update_user(db_session, db_user, UserUpdate(email=taken.email))
+
+    assert exc_info.value.status_code == HTTP_400_BAD_REQUEST
+    assert exc_info.value.detail == "Email already registered"
+
+
+@pytest.mark.unit
+async def test_create_users_inserts_batch(db_session: AsyncSession) -> None:
+    """Test bulk user creation and its duplicate email check."""
+    users_in = [
+        UserCreate(
+            email=f"bulk_{i}@example.com",
+            password="testpassword",
+            full_name=f"Bulk User {i}",
+        )
+        for i in range(3)
+    ]
+
+    user_ids = await create_users(db_session, users_in)
+
+    assert len(set(user_ids)) == len(users_in)
+    created = await get_user_by_email(db_session, "bulk_1@example.com")
+    assert created is not None
+    assert created.id in user_ids
+
+    with pytest.raises(HTTPException) as exc_info:
+        await create_users(db_session, users_in[:1])
+    assert exc_info.value.status_code == HTTP_400_BAD_REQUEST